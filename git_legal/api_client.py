@@ -2,92 +2,284 @@
 API client for fetching data from the BOE API.
 """
 
+import asyncio
 import datetime
+import hashlib
 import logging
+import os
 import time
-from math import isnan
-from typing import Optional, Tuple, Any
+from pathlib import Path
+from typing import Optional
 
-import requests
+import aiohttp
+import diskcache
 
 from git_legal.config import Config
 from git_legal.parser import IndexXmlParser
+from git_legal.rate_limit import AIMDLimiter, SlidingWindowCounter, parse_retry_after
 from git_legal.storage import LawInfo
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Status codes that mean the server is overloaded or rate limiting us
+OVERLOAD_STATUSES = {429, 502, 503, 504}
+
+# Size of the chunks written to disk while streaming a document
+CHUNK_SIZE = 64 * 1024
+
+# Longest pause taken because the server reports its quota is almost used up
+MAX_RATE_LIMIT_WAIT = 60.0
+
+# A missing index this recent may just not be published yet, its 404 is never cached
+UNPUBLISHED_DAYS = 7
+
 class APIClient:
     """Client for interacting with the BOE API."""
     
     def __init__(self, config: Config):
         """Initialize the API client with configuration."""
         self.config = config
-        self.session = requests.Session()
-    
-    def get_date_str(self, date: datetime.date) -> str:
-        """Convert a date to the format required by the API (YYYYMMDD)."""
-        return date.strftime("%Y%m%d")
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.cache: Optional[diskcache.Cache] = None
+        self._in_flight: dict[tuple[str, Optional[Path]], asyncio.Future] = {}
+        self._index_base = self.config.api_base_url
+        self.limiter = AIMDLimiter(
+            initial=self.config.concurrency,
+            minimum=self.config.min_concurrency,
+            maximum=self.config.concurrency,
+            target_latency=self.config.target_latency,
+        )
+        self.request_rate: Optional[SlidingWindowCounter] = None
+        if self.config.requests_per_minute > 0:
+            self.request_rate = SlidingWindowCounter(self.config.requests_per_minute, 60.0)
+        elif self.config.cooldown > 0:
+            self.request_rate = SlidingWindowCounter(1, self.config.cooldown)
+        self._throttled_until = 0.0
+        # Cleared while the server is rate limiting us, see _acquire_probe
+        self._rate_limit_gate = asyncio.Event()
+        self._rate_limit_gate.set()
+        self._probe_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "APIClient":
+        """Open the shared HTTP session. Must be called from a running event loop."""
+        # Every request goes to the same host, keep the connections (and their TLS sessions) alive
+        connector = aiohttp.TCPConnector(
+            limit=self.config.concurrency,
+            limit_per_host=self.config.concurrency,
+            keepalive_timeout=self.config.keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        # aiohttp already asks for gzip/deflate, and for brotli when it is installed
+        # (aiohttp[speedups]), and decodes the bodies transparently
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Accept": "application/xml"},
+            # Like requests' timeout=30: bound connecting and each read, not the whole
+            # download, so large documents on a slow link still complete
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30),
+        )
+        self.cache = diskcache.Cache(os.path.join(self.config.output, ".httpcache"))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the shared HTTP session and the response cache."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
     
-    def get_daily_boes(self, date: int) -> list[LawInfo]:
+    async def get_daily_boes(self, date: int) -> list[LawInfo]:
         """
         Fetch the summary for a specific date.
         """
         date_literal = str(date)
-        url = f"{self.config.api_base_url}{date_literal}"
-        headers = {"Accept": "application/xml"}
+        url = self._index_base + date_literal
 
-        status_code, text = self._def_get_data(url, headers, name=date_literal)
-        if text is not None:
-            return IndexXmlParser.parse(text)
+        age = datetime.date.today() - datetime.date(date // 10000, date // 100 % 100, date % 100)
+        status_code, content = await self._get_data(
+            url, name=date_literal, cache=True, cache_missing=age.days > UNPUBLISHED_DAYS
+        )
+        if content is not None:
+            # Parsing is CPU work, keep it off the event loop so downloads keep flowing
+            return await asyncio.to_thread(IndexXmlParser.parse, content)
         return []
 
-    def get_file(self, law_info: LawInfo, format: str = "xml"):
-        field_name = "url_" + format
-        url = getattr(law_info, field_name, None)
-        if url is None or not type(url) == str:
-            logger.warning(f"No {field_name} found for law {law_info.identificador}")
-            return None
-        headers = {"Accept": "application/xml"}
-        status_code, text = self._def_get_data(url, headers, name=law_info.identificador)
-        return text if status_code == 200 else None
+    async def get_file(self, url: str, destination: Path, name: str = "") -> bool:
+        """
+        Download a document straight to disk.
+
+        Returns:
+            Whether the document was saved to ``destination``
+        """
+        status_code, _ = await self._get_data(url, name=name, destination=destination)
+        return status_code == 200
+
+
+    async def _get_data(self, url, name: str = "", cache: bool = False,
+                        destination: Optional[Path] = None, cache_missing: bool = True):
+        """
+        Fetch a URL, sharing a single request between concurrent callers of the same URL.
+
+        Args:
+            url: URL to fetch
+            name: Name used in log messages
+            cache: Whether to keep the response in the on-disk cache. 404s are
+                cached for ``config.cache_expire`` seconds, 200s forever.
+            destination: If given, the body is streamed to this path instead of returned
+            cache_missing: Whether 404s are cached too, when ``cache`` is set
+
+        Returns:
+            Tuple of status code and response body, or the destination path when streaming
+        """
+        key = hashlib.sha1(url.encode()).hexdigest()
+        if cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug("Cache hit for %s", name)
+                return cached
+
+        # A streamed download is only shared by callers writing to the same path
+        flight = (key, destination)
+        if flight in self._in_flight:
+            return await asyncio.shield(self._in_flight[flight])
 
+        future = asyncio.ensure_future(self._def_get_data(url, name, destination))
+        self._in_flight[flight] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del self._in_flight[flight]
 
-    def _def_get_data(self, url, headers, name: str = ""):
-        self.apply_cooldown()
+        status_code, _ = result
+        if cache and (status_code == 200 or status_code == 404 and cache_missing):
+            expire = None if status_code == 200 else self.config.cache_expire
+            self.cache.set(key, result, expire=expire)
+        return result
+
+    async def _def_get_data(self, url, name: str = "", destination: Optional[Path] = None):
         for attempt in range(self.config.max_retries + 1):
+            await self.wait_if_throttled()
+            probe = await self._acquire_probe()
+            retry_after = None
             try:
-                logger.info(f"Requesting data for {name}")
-
-                # Add delay for rate limiting (except for first attempt)
-                if attempt > 0:
-                    time.sleep(self.config.retry_delay)
+                logger.info("Requesting data for %s", name)
 
-                response = self.session.get(url, headers=headers, timeout=30)
+                async with self.limiter:
+                    started = time.monotonic()
+                    async with self.session.get(url) as response:
+                        # Latency is measured to the response headers, large bodies are not a sign of overload
+                        self.limiter.record(time.monotonic() - started, response.status in OVERLOAD_STATUSES)
+                        if response.status == 200:
+                            content = await self._read_body(response, destination)
+                self._check_rate_limit_headers(response.headers)
+                if response.status == 429:
+                    self._rate_limit_gate.clear()
+                elif response.status in (200, 404):
+                    self._rate_limit_gate.set()
 
                 # Check if we got a valid response
-                if response.status_code == 200:
-                    logger.debug(f"Successfully retrieved data for {name}")
-                    return response.status_code, response.text
-                elif response.status_code == 404:
+                if response.status == 200:
+                    logger.debug("Successfully retrieved data for %s", name)
+                    return response.status, content
+                elif response.status == 404:
                     # 404 is expected for some dates, not an error
-                    logger.info(f"No data available for {name} (404)")
-                    return response.status_code, None
+                    logger.info("No data available for %s (404)", name)
+                    return response.status, None
                 else:
-                    logger.warning(f"Request failed with status code {response.status_code} for {name}")
+                    logger.warning("Request failed with status code %s for %s", response.status, name)
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        # The server told us when to come back, pause every request until then
+                        self.throttle_for(retry_after)
 
-            except requests.RequestException as e:
-                logger.error(f"Request error for date {name}: {str(e)}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.limiter.record(self.config.target_latency, overloaded=True)
+                logger.error("Request error for %s: %r", name, e)
+            finally:
+                if probe:
+                    self._probe_lock.release()
 
             # If we're not on the last attempt, log retry
             if attempt < self.config.max_retries:
-                logger.info(f"Retrying request for date: {name} (attempt {attempt + 1}/{self.config.max_retries})")
+                logger.info("Retrying request for date: %s (attempt %d/%d)", name, attempt + 1, self.config.max_retries)
+                if retry_after is None:
+                    await asyncio.sleep(self.config.retry_delay)
 
         # If we've exhausted all retries
-        logger.error(f"Failed to retrieve data for date: {name} after {self.config.max_retries} retries")
+        logger.error("Failed to retrieve data for %s after %d retries", name, self.config.max_retries)
         return 0, None  # Return 0 to indicate a client-side failure
-    
-    def apply_cooldown(self):
-        """Apply cooldown between requests to avoid rate limiting."""
-        if self.config.cooldown > 0:
-            time.sleep(self.config.cooldown)
+
+    @staticmethod
+    async def _read_body(response: aiohttp.ClientResponse, destination: Optional[Path] = None):
+        """
+        Read a response body, or stream it to ``destination`` without keeping it in memory.
+
+        The body is written to a temporary file that is only renamed once
+        complete, so an interrupted download never looks like a saved document.
+        """
+        if destination is None:
+            return await response.read()
+
+        partial = destination.with_name(destination.name + ".part")
+        try:
+            with open(partial, 'wb') as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(partial, destination)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return destination
+
+    async def _acquire_probe(self) -> bool:
+        """
+        While the server answers 429, let a single request through at a time.
+
+        The server sees one probe instead of every worker retrying at once;
+        the first successful response opens the gate for everybody again.
+
+        Returns:
+            Whether the caller is the probe and must release ``_probe_lock``
+        """
+        if self._rate_limit_gate.is_set():
+            return False
+        await self._probe_lock.acquire()
+        if self._rate_limit_gate.is_set():
+            # Another probe got through while we were waiting
+            self._probe_lock.release()
+            return False
+        await self.wait_if_throttled()
+        return True
+
+    def _check_rate_limit_headers(self, headers):
+        """Slow down ahead of time when the server reports its quota is almost used up."""
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            limit = int(headers["X-RateLimit-Limit"])
+        except (KeyError, ValueError):
+            return
+        if remaining < 0.1 * limit:
+            try:
+                reset = float(headers["X-RateLimit-Reset"])
+            except (KeyError, ValueError):
+                reset = self.config.retry_delay
+            if reset > 1e9:
+                # An epoch timestamp rather than a number of seconds
+                reset -= time.time()
+            self.throttle_for(min(max(reset, 0.0), MAX_RATE_LIMIT_WAIT))
+
+    def throttle_for(self, seconds: float):
+        """Hold back every request for the given number of seconds."""
+        self._throttled_until = max(self._throttled_until, time.monotonic() + seconds)
+
+    async def wait_if_throttled(self):
+        """Wait until the server allows a new request and the request rate limit has room for it."""
+        while (delay := self._throttled_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        if self.request_rate is not None:
+            delay = self.request_rate.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
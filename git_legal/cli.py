@@ -52,6 +52,13 @@ def parse_args(args: Optional[List[str]] = None) -> Config:
         help="Cooldown between requests in seconds. Has no effect if --concurrency is greater than one."
     )
     
+    parser.add_argument(
+        "--requests-per-minute",
+        type=int,
+        default=0,
+        help="Max number of requests in any 60 seconds window (default: no limit other than cooldown)."
+    )
+    
     parser.add_argument(
         "--output",
         type=str,
@@ -85,7 +92,7 @@ def parse_args(args: Optional[List[str]] = None) -> Config:
 
     config.ensure_output_dir()
     if config.concurrency > 1:
-        parsed_args.cooldown = 0.0
+        config.cooldown = 0.0
     return config
 
 
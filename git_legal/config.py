@@ -7,6 +7,11 @@ from dataclasses import dataclass, field
 from datetime import datetime
 
 
+def _data_path(*parts: str) -> str:
+    """Path inside the data folder of the current working directory."""
+    return os.path.join(os.getcwd(), "data", *parts)
+
+
 @dataclass
 class Config:
     """Configuration settings for the application."""
@@ -24,11 +29,19 @@ class Config:
     max_retries: int = 3  # Maximum number of retries for failed requests
     retry_delay: float = 5.0  # Delay between retries in seconds
     concurrency: int = 1  # Default to sequential execution
+    keepalive_timeout: float = 60.0  # Seconds an idle connection is kept open for reuse
+    min_concurrency: int = 1  # Lowest concurrency the adaptive limiter backs off to
+    target_latency: float = 5.0  # Response time in seconds above which concurrency is reduced
+    requests_per_minute: int = 0  # Max requests in any 60 seconds window, 0 to only use cooldown
+    cache_expire: float = 86400.0  # Seconds a missing (404) index is cached before asking again
+    queue_size: int = 1000  # Max number of laws waiting to be downloaded
     
     # Storage settings
-    output: str = os.path.join(os.getcwd(), "data")
+    output: str = field(default_factory=_data_path)
     csv_filename: str = "boe_data.csv"
-    resume_file: str = os.path.join(os.getcwd(), "data", "resume_state.json")
+    csv_batch_size: int = 10000  # Rows buffered before appending them to the CSV
+    resume_interval: float = 5.0  # Min seconds between two saves of the resume state
+    resume_file: str = field(default_factory=lambda: _data_path("resume_state.json"))
 
     
     # Create output directory if it doesn't exist
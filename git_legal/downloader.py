@@ -2,34 +2,36 @@
 Main downloader module for fetching BOE data.
 """
 
+import asyncio
+import calendar
 import datetime
+import functools
 import logging
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Optional, List
-from urllib.parse import urlparse, parse_qs
-
-import pandas as pd
+import operator
+import queue
+import threading
+import time
+from typing import Iterator, Optional
 
 from git_legal.api_client import APIClient
 from git_legal.config import Config
 from git_legal.storage import CsvStorage, FileStorage, ResumeStorage, LawInfo
-from git_legal.parser import get_parser
 import tqdm
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
 
+@functools.lru_cache(maxsize=8192)
+def _parse_date_literal(date_literal: int) -> datetime.date:
+    year, rest = divmod(date_literal, 10000)
+    month, day = divmod(rest, 100)
+    return datetime.date(year, month, day)
+
+
 def date_literal_to_datetime(date_literal: str | int) -> datetime.date:
     """Convert a date literal to a datetime.date object."""
-    if type(date_literal) == int:
-        date_literal = str(date_literal)
-    start_year = int(date_literal[:4])
-    start_month = int(date_literal[4:6])
-    start_day = int(date_literal[6:8])
-    date = datetime.date(start_year, start_month, start_day)
-    return date
+    return _parse_date_literal(int(date_literal))
 
 
 class BOEDownloader:
@@ -42,82 +44,260 @@ class BOEDownloader:
         self.index = CsvStorage(self.config)
         self.files = FileStorage(self.config)
         self.resume_state = ResumeStorage(self.config)
+        # (format, field name, getter of the document URL) for every requested format
+        self._url_fields = tuple(
+            (format, "url_" + format, operator.attrgetter("url_" + format))
+            for format in self.config.format
+        )
 
-    def _get_date_range(self) -> List[int]:
+    def _get_date_bounds(self) -> tuple[datetime.date, datetime.date]:
         # Use the provided start date, resume state, or configured start date
         start_date_lit = self.resume_state.load_resume_state() or self.config.start
         start_date = date_literal_to_datetime(start_date_lit)
         end_date = date_literal_to_datetime(self.config.end)
+        return start_date, end_date
 
-        # Generate the date range
-        date_range = []
-        current_date = start_date
-        while current_date <= end_date:
-            formated_date = int(current_date.strftime("%Y%m%d"))
-            date_range.append(formated_date)
-            current_date += datetime.timedelta(days=1)
+    @staticmethod
+    def _get_date_range(start_date: datetime.date, end_date: datetime.date) -> Iterator[int]:
+        """
+        Yield every date between start_date and end_date (inclusive) as a YYYYMMDD integer.
 
-        return date_range
+        Within a month the integers are consecutive, so each month is a plain
+        range and no date objects are created per day.
+        """
+        year, month, day = start_date.year, start_date.month, start_date.day
+        while (year, month) <= (end_date.year, end_date.month):
+            base = year * 10000 + month * 100
+            if (year, month) == (end_date.year, end_date.month):
+                last_day = end_date.day
+            else:
+                last_day = calendar.monthrange(year, month)[1]
+            yield from range(base + day, base + last_day + 1)
+            day = 1
+            month += 1
+            if month > 12:
+                year += 1
+                month = 1
 
 
-    def _get_daily_boes(self, date) -> list[LawInfo] | None:
-        # Here
+    async def _get_daily_boes(self, date) -> list[LawInfo] | None:
         boes = self.index.get_values_for_date(date)
         if boes is not None:
             return boes
         else:
-            boes = self.api_client.get_daily_boes(date)
+            boes = await self.api_client.get_daily_boes(date)
             if boes is not None:
-                self.index.save_items(boes)
+                await self._queue_write(("index", boes))
                 return boes
             else:
                 return []
 
 
-    def _process_item(self, law_info: LawInfo) -> int:
+    async def _process_item(self, law_info: LawInfo) -> int:
         """
-        Process a single date: fetch data, parse it, and save to CSV.
+        Process a single law: download all its documents concurrently, straight to disk.
 
         Args:
-            indexer: Date string in YYYYMMDD format
+            law_info: Index entry of the law to download
 
         Returns:
-            Number of items saved
+            Number of documents saved
         """
+        downloads = []
+        for format, field_name, get_url in self._url_fields:
+            url = get_url(law_info)
+            if not isinstance(url, str):
+                logger.warning("No %s found for law %s", field_name, law_info.identificador)
+                continue
+            if self.files.exists(law_info, format):
+                logger.debug("Skipping %s.%s, already downloaded", law_info.identificador, format)
+                continue
+            path = self.files.prepare_path(law_info, format)
+            downloads.append(self._download(url, path, law_info.identificador))
 
-        # Fetch data from API
-        total_downloaded = 0
-        for format in self.config.format:
-            response_text = self.api_client.get_file(law_info, format)
+        # The API client limiter bounds how many of these run at once across all laws
+        results = await asyncio.gather(*downloads)
+        return sum(results)
 
-            if response_text:
-                total_downloaded += self.files.save_item(response_text, law_info, format)
-        return total_downloaded
 
+    async def _download(self, url: str, path, name: str) -> bool:
+        saved = await self.api_client.get_file(url, path, name=name)
+        if saved:
+            logger.info("Saved document to %s", path)
+        return saved
+
+
+    async def _queue_write(self, message: Optional[tuple]):
+        """Hand a message to the writer thread, waiting off the event loop while its queue is full."""
+        try:
+            self._writes.put_nowait(message)
+        except queue.Full:
+            await asyncio.to_thread(self._writes.put, message)
+
+
+    async def _complete_law(self, date: int):
+        """Mark one law of a date as processed, completing the date when it was the last one."""
+        self._docs_bar.update(1)
+        self._pending[date] -= 1
+        if self._pending[date] == 0:
+            del self._pending[date]
+            await self._complete_date(date)
+
+
+    async def _complete_date(self, date: int):
+        """
+        Mark a date as processed and advance the resume state.
+
+        Dates finish out of order, so the resume state only moves forward
+        to the last date of the contiguous run of completed dates.
+        """
+        self._days_bar.update(1)
+        self._completed.add(date)
+        last_contiguous = None
+        while self._next_date in self._completed:
+            last_contiguous = self._next_date
+            self._completed.discard(last_contiguous)
+            self._next_date = next(self._expected_dates, None)
+        if last_contiguous is not None:
+            await self._queue_write(("resume", last_contiguous))
+
+
+    async def _produce_dates(self, start_date: datetime.date, end_date: datetime.date):
+        """Feed the dates to the index workers as they make room for them."""
+        for date in self._get_date_range(start_date, end_date):
+            await self._dates.put(date)
 
-    def start(self) -> int:
-        logger.info(f"Starting concurrent download with {self.config.concurrency} workers")
-        date_range = self._get_date_range()
-        total_saved = 0
 
-        with ThreadPoolExecutor(max_workers=self.config.concurrency) as executor:
-            for date in tqdm.tqdm(date_range, desc="Days"):
-                daily_boes = self._get_daily_boes(date)
-                if daily_boes is None or self.config.index_only:
+    async def _index_worker(self):
+        """Fetch daily indexes and enqueue their laws for download."""
+        while True:
+            date = await self._dates.get()
+            try:
+                daily_boes = await self._get_daily_boes(date)
+                if not daily_boes or self.config.index_only:
+                    await self._complete_date(date)
                     continue
 
-                future_to_date = {executor.submit(self._process_item, law_info): law_info
-                                  for law_info in daily_boes}
-                for future in tqdm.tqdm(as_completed(future_to_date),total=len(future_to_date), desc="Daily BOEs", leave=False):
-                    date_str = future_to_date[future]
-                    try:
-                        saved_count = future.result()
-                        total_saved += saved_count
-                        logger.info(f"Processed date {date_str}: saved {saved_count} items")
-                    except Exception as e:
-                        logger.error(f"Error processing date {date_str}: {str(e)}")
+                self._pending[date] = len(daily_boes)
+                self._docs_bar.total += len(daily_boes)
+                self._docs_bar.refresh()
+                for law_info in daily_boes:
+                    await self._laws.put((date, law_info))
+            except Exception as e:
+                logger.error(f"Error processing date {date}: {str(e)}")
+            finally:
+                self._dates.task_done()
 
-                self.resume_state.save_resume_state(date)
 
+    async def _document_worker(self):
+        """Download the documents of the enqueued laws."""
+        while True:
+            date, law_info = await self._laws.get()
+            try:
+                saved_count = await self._process_item(law_info)
+                self._total_saved += saved_count
+                logger.info("Processed law %s: saved %d items", law_info.identificador, saved_count)
+            except Exception as e:
+                logger.error(f"Error processing law {law_info.identificador}: {str(e)}")
+            finally:
+                # Queue the resume update before join() can see the law as done
+                try:
+                    await self._complete_law(date)
+                finally:
+                    self._laws.task_done()
+
+
+    def _writer(self):
+        """
+        Single consumer for the index and resume state writes, on its own thread.
+
+        CSV appends are not safe to interleave, so all of them go through
+        this thread in the order they were queued. Whatever piled up since
+        the last pass is written at once, and the resume state is only saved
+        every ``config.resume_interval`` seconds and at shutdown.
+        """
+        pending_resume: Optional[int] = None
+        last_resume = time.monotonic()
+        stop = False
+        while not stop:
+            messages = [self._writes.get()]
+            while True:
+                try:
+                    messages.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            items = []
+            for message in messages:
+                if message is None:
+                    stop = True
+                    continue
+                kind, payload = message
+                if kind == "index":
+                    items.extend(payload)
+                elif kind == "resume":
+                    pending_resume = payload
+
+            try:
+                self.index.save_items(items)
+                if pending_resume is not None and (stop or time.monotonic() - last_resume >= self.config.resume_interval):
+                    # The resume state must never get ahead of the rows on disk
+                    if self.index.flush():
+                        self.resume_state.save_resume_state(pending_resume)
+                    else:
+                        logger.error(f"Index rows could not be written, resume state not moved to {pending_resume}")
+                    pending_resume = None
+                    last_resume = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error writing index: {str(e)}")
+
+
+    async def _run(self) -> int:
+        start_date, end_date = self._get_date_bounds()
+        # Second pass over the range, used to advance the resume state in order
+        self._expected_dates = self._get_date_range(start_date, end_date)
+        self._next_date = next(self._expected_dates, None)
+        self._completed: set[int] = set()
+        self._pending: dict[int, int] = {}
+        self._total_saved = 0
+
+        self._dates: asyncio.Queue[int] = asyncio.Queue(maxsize=self.config.concurrency)
+        self._laws: asyncio.Queue[tuple[int, LawInfo]] = asyncio.Queue(maxsize=self.config.queue_size)
+        # Bounded, so the downloads slow down instead of piling up rows when the disk is behind
+        self._writes: queue.Queue[Optional[tuple]] = queue.Queue(maxsize=2 * self.config.concurrency)
+        writer = threading.Thread(target=self._writer, name="boe-writer", daemon=True)
+        writer.start()
+
+        self._days_bar = tqdm.tqdm(total=max(0, (end_date - start_date).days + 1), desc="Days")
+        self._docs_bar = tqdm.tqdm(total=0, desc="Daily BOEs", leave=False)
+
+        async with self.api_client:
+            producer = asyncio.create_task(self._produce_dates(start_date, end_date))
+            workers = [asyncio.create_task(self._index_worker()) for _ in range(self.config.concurrency)]
+            workers += [asyncio.create_task(self._document_worker()) for _ in range(self.config.concurrency)]
+            workers.append(producer)
+            try:
+                await producer
+                await self._dates.join()
+                await self._laws.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                # Let the writer drain what is left before leaving
+                await self._queue_write(None)
+                await asyncio.to_thread(writer.join)
+                self._docs_bar.close()
+                self._days_bar.close()
+
+        return self._total_saved
+
+
+    def start(self) -> int:
+        logger.info(f"Starting concurrent download with {self.config.concurrency} workers")
+        try:
+            total_saved = asyncio.run(self._run())
+        finally:
+            self.index.close()
         logger.info(f"Concurrent download completed: saved {total_saved} items in total")
         return total_saved
@@ -1,17 +1,28 @@
 """
 Parser for BOE API XML responses.
 """
-import copy
 import logging
-import xml.etree.ElementTree as ET
+import sys
 from datetime import datetime
-from typing import Dict, List, Any
+from io import BytesIO
+from typing import BinaryIO, Dict, List, Any
+
+from lxml import etree as ET
 
 from git_legal.storage import LawInfo
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Lookups compiled once and evaluated by libxml2
+_STATUS_CODE = ET.XPath("string(code)")
+_FECHA_PUBLICACION = ET.XPath("string(fecha_publicacion)")
+# Parser settings for the sumarios: no network or entity lookups, no
+# whitespace-only text nodes and no id table, the index never needs them
+_PARSER_OPTIONS = dict(
+    no_network=True, resolve_entities=False, remove_blank_text=True, collect_ids=False, huge_tree=False
+)
+
 def date_to_timestamp(date_str: int | str) -> int:
     """
     Convert a date string in YYYYMMDD format to UTC timestamp.
@@ -37,6 +48,10 @@ def date_to_timestamp(date_str: int | str) -> int:
         return 0
 
 
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if value is not None else None
+
+
 class LawXmlParser:
     @staticmethod
     def parse(xml_content: str):
@@ -56,70 +71,65 @@ def get_parser(target: str):
 
 class IndexXmlParser:
     """Parser for BOE API XML responses."""
+
+    # Ancestors of an item whose attributes are copied into its LawInfo
+    ANCESTORS = ("epigrafe", "departamento", "seccion", "diario")
+    # Children of an item whose text is copied into its LawInfo
+    FIELDS = ("url_pdf", "url_html", "url_xml", "titulo", "identificador", "control")
     
     @staticmethod
-    def parse(xml_content: str) -> List[LawInfo]:
+    def parse(xml_content: bytes | BinaryIO) -> List[LawInfo]:
         """
         Parse the XML content from a BOE API response.
+
+        The document is streamed one item at a time and every element is
+        released as soon as it ends, items as well as the sections that
+        contained them, so memory does not grow with the sumario size.
         
         Args:
-            xml_content: XML string from the API
+            xml_content: XML bytes from the API, or a binary stream to read them from
             
         Returns:
-            List of dictionaries containing the extracted data
+            List of LawInfo, one per item of the sumario
         """
         try:
-            law_info = LawInfo()
+            fecha_publicacion = None
+            timestamp = None
+            status_ok = False
+            items = []
 
-            root = ET.fromstring(xml_content)
-            
-            # Check if the response is valid
-            status_code = root.find(".//status/code")
-            if status_code is None or status_code.text != "200":
+            source = BytesIO(xml_content) if isinstance(xml_content, bytes) else xml_content
+            context = ET.iterparse(
+                source, events=("end",), tag=("status", "metadatos", "item") + IndexXmlParser.ANCESTORS,
+                **_PARSER_OPTIONS
+            )
+            for _, elem in context:
+                if elem.tag == "status":
+                    # Check if the response is valid
+                    status_ok = _STATUS_CODE(elem) == "200"
+                    if not status_ok:
+                        break
+                elif elem.tag == "metadatos":
+                    fecha_publicacion = _FECHA_PUBLICACION(elem)
+                    fecha_publicacion = int(fecha_publicacion) if fecha_publicacion else None
+                    timestamp = date_to_timestamp(fecha_publicacion)
+                elif elem.tag == "item":
+                    items.append(IndexXmlParser.decode_item(elem, fecha_publicacion, timestamp))
+
+                # Release the processed element and the siblings already handled
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+            if not status_ok:
                 logger.error("Invalid response: status code not 200")
                 return []
-            
-            # Extract metadata
-            metadata = {}
-            metadatos_elem = root.find(".//metadatos")
-            if metadatos_elem is not None:
-                for child in metadatos_elem:
-                    metadata[child.tag] = child.text
-            law_info.fecha_publicacion = metadata["fecha_publicacion"]
-            law_info.fecha_publicacion = int(law_info.fecha_publicacion) if law_info.fecha_publicacion else None
-            law_info.timestamp = date_to_timestamp(law_info.fecha_publicacion)
-            
-            # Extract items
-            items = []
-            
-            for diario_item in root.findall(".//diario"):
-                # Deal with diario
-                sumario_diario = diario_item.find(".//sumario_diario")
-                if sumario_diario is not None and sumario_diario.tag == "sumario_diario":
-                    law_info.numero_diario = sumario_diario.get("numero", None)
-                else:
-                    law_info.identificador_diario = None
-
-
-                for seccion_item in diario_item.findall(".//seccion"):
-                    law_info.seccion_codigo = seccion_item.get("codigo", "")
-                    law_info.seccion_nombre = seccion_item.get("nombre", "")
-
-                    for departamento_item in seccion_item.findall(".//departamento"):
-                        law_info.departamento_codigo = departamento_item.get("codigo", "")
-                        law_info.departamento_nombre = departamento_item.get("nombre", "")
-
-                        for epigrafe_elem in departamento_item.findall(".//epigrafe"):
-                            law_info.epigrafe_nombre = epigrafe_elem.get("nombre", "")
-                            law_info = IndexXmlParser.decode_item(law_info, epigrafe_elem)
-                            items.append(copy.copy(law_info))
-                        else:
-                            law_info.epigrafe_nombre = None
-                            law_info = IndexXmlParser.decode_item(law_info, departamento_item)
-                            items.append(copy.copy(law_info))
+            if fecha_publicacion is None:
+                logger.error("Invalid response: no fecha_publicacion")
+                return []
             return items
             
-        except ET.ParseError as e:
+        except ET.XMLSyntaxError as e:
             logger.error(f"XML parsing error: {str(e)}")
             return []
         except Exception as e:
@@ -127,15 +137,39 @@ class IndexXmlParser:
             return []
 
     @staticmethod
-    def decode_item(item: LawInfo, epigrafe_elem):
-        for item_elem in epigrafe_elem.findall(".//item"):
-            item.epigrafe_nombre = epigrafe_elem.get("nombre", None)
-
-            # Extract URLs
-            for url_type in ["url_pdf", "url_html", "url_xml", "titulo", "identificador", "control"]:
-                url_elem = item_elem.find(f".//{url_type}")
-                if url_elem is not None:
-                    setattr(item, url_type, url_elem.text.strip() if url_elem.text else "")
-                else:
-                    setattr(item, url_type, None)
-        return item
+    def decode_item(item_elem, fecha_publicacion: int | None, timestamp: int | None) -> LawInfo:
+        """Build the LawInfo of an item from its children and the attributes of its ancestors."""
+        numero_diario = None
+        seccion_codigo = seccion_nombre = None
+        departamento_codigo = departamento_nombre = None
+        epigrafe_nombre = None
+        for ancestor in item_elem.iterancestors(*IndexXmlParser.ANCESTORS):
+            # These few values repeat on every item, interned they share one string
+            if ancestor.tag == "epigrafe":
+                epigrafe_nombre = _intern(ancestor.get("nombre", None))
+            elif ancestor.tag == "departamento":
+                departamento_codigo = sys.intern(ancestor.get("codigo", ""))
+                departamento_nombre = sys.intern(ancestor.get("nombre", ""))
+            elif ancestor.tag == "seccion":
+                seccion_codigo = sys.intern(ancestor.get("codigo", ""))
+                seccion_nombre = sys.intern(ancestor.get("nombre", ""))
+            else:
+                numero_diario = ancestor.get("numero", None)
+
+        # Extract URLs and the rest of the fields in a single pass over the children
+        values = dict.fromkeys(IndexXmlParser.FIELDS)
+        for child in item_elem:
+            if child.tag in values:
+                values[child.tag] = child.text.strip() if child.text else ""
+
+        return LawInfo(
+            fecha_publicacion=fecha_publicacion,
+            timestamp=timestamp,
+            numero_diario=numero_diario,
+            seccion_codigo=seccion_codigo,
+            seccion_nombre=seccion_nombre,
+            departamento_codigo=departamento_codigo,
+            departamento_nombre=departamento_nombre,
+            epigrafe_nombre=epigrafe_nombre,
+            **values,
+        )
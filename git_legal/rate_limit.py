@@ -0,0 +1,101 @@
+"""
+Rate limiting helpers for the BOE API client.
+"""
+
+import asyncio
+import email.utils
+import time
+from collections import deque
+from typing import Optional
+
+
+class AIMDLimiter:
+    """
+    Concurrency limiter driven by additive-increase/multiplicative-decrease.
+
+    The number of allowed in-flight requests grows by ``increase`` while the
+    average latency stays under ``target_latency`` and is multiplied by
+    ``decrease`` whenever the server reports overload or a request is slow.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float,
+                 window: int = 20, increase: float = 0.5, decrease: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def record(self, latency: float, overloaded: bool = False):
+        """Record the outcome of a request and adjust the limit."""
+        self._latencies.append(latency)
+        average = sum(self._latencies) / len(self._latencies)
+        if overloaded or latency > self.target_latency:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+        elif average <= self.target_latency:
+            self.limit = min(self.maximum, self.limit + self.increase)
+
+
+class SlidingWindowCounter:
+    """
+    Allow at most ``limit`` events in any ``window`` seconds.
+
+    Callers reserve a start time instead of polling for room: each reservation
+    is scheduled right after the one ``limit`` places before it, so concurrent
+    callers are spread over the window and each sleeps only once.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        # Start times of the last ``limit`` reservations
+        self._events: deque[float] = deque(maxlen=limit)
+
+    def reserve(self) -> float:
+        """
+        Reserve the next free slot for an event.
+
+        Returns:
+            Seconds to wait before the reserved slot starts, 0 to go right away
+        """
+        now = time.monotonic()
+        start = now
+        if len(self._events) == self.limit:
+            start = max(now, self._events[0] + self.window)
+        self._events.append(start)
+        return start - now
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header, given either in seconds or as an HTTP date.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
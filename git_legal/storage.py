@@ -5,13 +5,15 @@ import abc
 import csv
 import json
 import logging
+import operator
 import os
-from dataclasses import dataclass
+import tempfile
+import threading
+from dataclasses import dataclass, fields
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import ClassVar, Dict, List, Any, Optional
 
-import numpy as np
 import pandas as pd
 
 from git_legal.config import Config
@@ -19,7 +21,7 @@ from git_legal.config import Config
 # Set up logging
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class LawInfo:
     fecha_publicacion: int | None = None
     timestamp: int | None = None
@@ -83,48 +85,87 @@ class FileStorage:
         """Initialize the storage handler with configuration."""
         self.config = config
 
-    def save_item(self, data: str, law_info: LawInfo, extension: str = "pdf" ):
+    def get_path(self, law_info: LawInfo, extension: str = "pdf") -> Path:
         seccion = law_info.seccion_nombre or "OTROS"
         year = str(round((law_info.fecha_publicacion or 0) // 10000))
         key = law_info.identificador
-        folder = Path(self.config.output) / extension / seccion / year
-        folder.mkdir(parents=True, exist_ok=True)
-        path = folder / f"{key}.{extension}"
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(data)
-        logger.info(f"Saved document to {path}")
-        return 1
+        return Path(self.config.output) / extension / seccion / year / f"{key}.{extension}"
+
+    def exists(self, law_info: LawInfo, extension: str = "pdf") -> bool:
+        """Whether the document was already saved by a previous run."""
+        return self.get_path(law_info, extension).exists()
+
+    def prepare_path(self, law_info: LawInfo, extension: str = "pdf") -> Path:
+        """Return the path of a document, creating its folder."""
+        path = self.get_path(law_info, extension)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
 
 
 
 class CsvStorage:
     """Storage handler for BOE index."""
+
+    # Column order of the CSV file
+    HEADERS: ClassVar[tuple[str, ...]] = tuple(LawInfo.get_header())
+    # Builds the CSV row of a LawInfo in C, in HEADERS order
+    ROW: ClassVar[operator.attrgetter] = operator.attrgetter(*HEADERS)
+    # LawInfo fields in declaration order, to build it from positional values
+    FIELDS: ClassVar[list[str]] = [field.name for field in fields(LawInfo)]
+    # Every column but the two dates is read as text, like the parser gives it,
+    # even when it looks numeric
+    TEXT: ClassVar[dict[str, type]] = dict.fromkeys(HEADERS[2:], str)
+    # The dates are nullable integers, a row missing one must not fail the whole read
+    DTYPES: ClassVar[dict[str, Any]] = {"fecha_publicacion": "Int64", "timestamp": "Int64", **TEXT}
+    # Columns with a few distinct values, loaded as one shared string per value
+    CATEGORIES: ClassVar[frozenset[str]] = frozenset(
+        ("seccion_codigo", "seccion_nombre", "departamento_codigo", "departamento_nombre", "epigrafe_nombre")
+    )
     
     def __init__(self, config: Config):
         """Initialize the storage handler with configuration."""
         self.config = config
         self.csv_path = os.path.join(self.config.output, self.config.csv_filename)
+        # Rows saved but not yet appended to the CSV file
+        self._pending_rows: list[tuple] = []
+        # Set once rows could not be written, they are lost for this run
+        self._write_failed = False
         
         # Create CSV file with headers if it doesn't exist
-        self.data = self._load_data()
+        self.data: dict[int, list[LawInfo]] = self._load_data()
+        # Kept open for the whole run, rows are written through a large buffer
+        self._fh = open(self.csv_path, 'a', newline='', encoding='utf-8', buffering=1 << 20)
+        self._writer = csv.writer(self._fh)
 
-    def _load_data(self) -> pd.DataFrame:
+    def _load_data(self) -> dict[int, list[LawInfo]]:
+        """Read the index once and group its laws by publication date."""
         self._ensure_csv_exists()
-        df = pd.read_csv(self.csv_path)
-        df.replace(np.nan, None)
-        return df.sort_values('fecha_publicacion')
+        try:
+            # Multithreaded Arrow parser, much faster on large indexes
+            df = pd.read_csv(self.csv_path, engine="pyarrow", dtype=self.DTYPES)
+        except (ImportError, ValueError) as e:
+            logger.warning(f"Falling back to the default CSV parser: {str(e)}")
+            df = pd.read_csv(self.csv_path, dtype=self.DTYPES)
+        # Missing cells come back as NaN or NA, and NaN is truthy: make them None
+        for column in df.columns:
+            values = df[column].astype("category") if column in self.CATEGORIES else df[column]
+            df[column] = values.astype(object).where(values.notna(), None)
+        data: dict[int, list[LawInfo]] = {}
+        # Plain tuples in field order, no per-row dict is built
+        skipped = 0
+        for row in df[self.FIELDS].itertuples(index=False, name=None):
+            law = LawInfo(*row)
+            if law.fecha_publicacion is None:
+                skipped += 1
+                continue
+            data.setdefault(law.fecha_publicacion, []).append(law)
+        if skipped:
+            logger.warning(f"Skipped {skipped} rows without fecha_publicacion in {self.csv_path}")
+        return data
 
 
     def get_values_for_date(self, date: int) -> list[LawInfo] | None:
-        if self.data.empty or date > self.data.fecha_publicacion.max() or date < self.data.fecha_publicacion.min():
-            return None
-        rows = self.data.loc[self.data["fecha_publicacion"] == date]
-        decoded_rows = [
-            LawInfo(**record)
-            for record
-            in rows.to_dict(orient='records')
-        ]
-        return decoded_rows
+        return self.data.get(date)
 
 
 
@@ -133,19 +174,19 @@ class CsvStorage:
         """Ensure the CSV file exists with headers."""
         if not os.path.exists(self.csv_path):
             logger.info(f"Creating new CSV file: {self.csv_path}")
-            # Define the headers based on the expected data structure
-            headers = LawInfo.get_header()
-            
             with open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                writer.writeheader()
+                writer = csv.writer(f)
+                writer.writerow(self.HEADERS)
     
     def save_items(self, items: List[LawInfo]) -> int:
         """
         Save items to the CSV file.
+
+        Rows are buffered and appended in batches of ``config.csv_batch_size``,
+        call ``flush`` to write the remaining ones.
         
         Args:
-            items: List of item dictionaries to save
+            items: List of items to save
             
         Returns:
             Number of items saved
@@ -153,24 +194,13 @@ class CsvStorage:
         if not items:
             return 0
 
-        dicts = [item.__dict__ for item in items]
-
         try:
-            # Get existing headers from the CSV file
-            with open(self.csv_path, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                headers = next(reader)
-            
-            # Append items to the CSV file
-            with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                
-                for item in dicts:
-                    # Filter out any keys not in headers
-                    filtered_item = {k: v for k, v in item.items() if k in headers}
-                    writer.writerow(filtered_item)
-
-            self.data = pd.concat([self.data, pd.DataFrame.from_records(dicts)], ignore_index=True)
+            self._pending_rows.extend(map(self.ROW, items))
+            if len(self._pending_rows) >= self.config.csv_batch_size:
+                self.flush()
+
+            for item in items:
+                self.data.setdefault(item.fecha_publicacion, []).append(item)
             logger.info(f"Saved {len(items)} items to CSV")
 
             return len(items)
@@ -178,36 +208,79 @@ class CsvStorage:
         except Exception as e:
             logger.error(f"Error saving items to CSV: {str(e)}")
             return 0
+
+    def flush(self) -> bool:
+        """
+        Append the buffered rows to the CSV file.
+
+        Returns:
+            Whether every row saved so far reached the file
+        """
+        if not self._pending_rows:
+            return not self._write_failed
+        try:
+            self._writer.writerows(self._pending_rows)
+            self._fh.flush()
+            logger.info(f"Appended {len(self._pending_rows)} rows to CSV")
+        except Exception as e:
+            self._write_failed = True
+            logger.error(f"Error saving items to CSV: {str(e)}")
+        self._pending_rows = []
+        return not self._write_failed
+
+    def close(self):
+        """Write the buffered rows, sync them to disk and close the CSV file."""
+        if self._fh.closed:
+            return
+        self.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+
+    def __del__(self):
+        # Safety net for callers that never close the storage
+        if hasattr(self, "_fh"):
+            self.close()
     
 class ResumeStorage:
 
     def __init__(self, config: Config):
         self.config = config
         self.resume_path = os.path.join(self.config.output, "resume.json")
+        self._last_saved_date: Optional[int] = None
+        self._lock = threading.Lock()
+        # Create the directory if it doesn't exist
+        os.makedirs(os.path.dirname(self.resume_path), exist_ok=True)
 
     def save_resume_state(self, last_date: int):
         """
         Save the resume state to allow continuing from where we left off.
 
+        Nothing is written if the date did not change since the last save.
+
         Args:
             last_date: The last date processed (YYYYMMDD format)
         """
-        try:
-            # Create the directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.resume_path), exist_ok=True)
-
-            state = {
-                "last_date": last_date,
-                "timestamp": datetime.now().isoformat()
-            }
-
-            with open(self.resume_path, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2)
-
-            logger.info(f"Saved resume state: last_date={last_date}")
-
-        except Exception as e:
-            logger.error(f"Error saving resume state: {str(e)}")
+        with self._lock:
+            if last_date == self._last_saved_date:
+                return
+            try:
+                state = {
+                    "last_date": last_date,
+                    "timestamp": datetime.now().isoformat()
+                }
+
+                # Write to a temporary file first, an interrupted write never corrupts the state
+                with tempfile.NamedTemporaryFile(
+                    'w', encoding='utf-8', dir=os.path.dirname(self.resume_path), suffix=".tmp", delete=False
+                ) as f:
+                    json.dump(state, f, indent=2)
+                os.replace(f.name, self.resume_path)
+                self._last_saved_date = last_date
+
+                logger.info(f"Saved resume state: last_date={last_date}")
+
+            except Exception as e:
+                logger.error(f"Error saving resume state: {str(e)}")
 
     def load_resume_state(self) -> Optional[int]:
         """